@@ -0,0 +1,76 @@
+# cleanup_media.py
+"""Delete Drive uploads that were never attached to a submitted observation.
+
+Run once a day, e.g. from cron: python cleanup_media.py
+"""
+from datetime import datetime
+from utility import *
+
+def cleanup_pending_media():
+    """Delete expired, unsubmitted uploads and drop their PendingMedia rows"""
+    drive_service, sheets_client = get_google_services()
+    if not drive_service:
+        return
+    
+    pending_sheet = get_or_create_sheet(sheets_client, "PendingMedia")
+    pending = google_retry(pending_sheet.get_all_records)()
+    media_sheet = get_or_create_sheet(sheets_client, "Media")
+    submitted = {media["File ID"] for media in google_retry(media_sheet.get_all_records)()}
+    
+    now = datetime.now()
+    expired = []
+    for index, row in enumerate(pending):
+        try:
+            expires_at = datetime.strptime(str(row["Expires At"]), "%Y-%m-%d %H:%M:%S")
+        except (KeyError, ValueError):
+            # Blank or hand-edited rows are left for someone to look at
+            logger.warning("Skipping PendingMedia row %d with bad Expires At: %r", index + 2, row.get("Expires At"))
+            continue
+        if expires_at <= now:
+            expired.append((index, row))
+    # A deduplicated upload can be pending again under a newer expiry
+    still_pending = {row["File ID"] for row in pending} - {row["File ID"] for _, row in expired}
+    orphans = {row["File ID"] for _, row in expired} - submitted - still_pending
+    
+    credentials = get_credentials()
+    
+    def delete(file_id):
+        delete_drive_file(drive_service, file_id, http=get_thread_http(credentials))
+    
+    futures = {EXECUTOR.submit(delete, file_id): file_id for file_id in orphans}
+    failed = set()
+    for future in as_completed(futures):
+        try:
+            future.result()
+        except HttpError as e:
+            # Already gone is as good as deleted
+            if e.resp.status != 404:
+                failed.add(futures[future])
+                logger.warning("Could not delete %s: %s", futures[future], e)
+    
+    # Delete bottom-up in one request so earlier row numbers stay valid;
+    # rows appended while this runs sit below and are not touched
+    requests = [
+        {
+            "deleteDimension": {
+                "range": {
+                    "sheetId": pending_sheet.id,
+                    "dimension": "ROWS",
+                    "startIndex": index + 1,
+                    "endIndex": index + 2
+                }
+            }
+        }
+        for index, row in reversed(expired)
+        if row["File ID"] not in failed
+    ]
+    if requests:
+        # Repeating an applied delete would remove the rows below it, so only
+        # retry when the request was refused outright
+        write_retry(get_workbook(sheets_client).batch_update)({"requests": requests})
+    
+    logger.info("Deleted %d orphaned uploads, cleared %d pending rows", len(orphans - failed), len(requests))
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    cleanup_pending_media()
@@ -1,9 +1,95 @@
 
 # form_sections.py
 import streamlit as st
-from datetime import datetime
+from datetime import datetime, timedelta
+import hashlib
+import uuid
 from utility import *
 
+# Answer choices shared by every classroom observation question
+YNS = ("Yes", "No", "Sometimes")
+
+def record_pending_media(file_ids):
+    """Log fresh uploads so cleanup_media.py can delete them if never submitted"""
+    if "session_id" not in st.session_state:
+        st.session_state.session_id = uuid.uuid4().hex
+    
+    expires_at = (datetime.now() + timedelta(hours=PENDING_MEDIA_HOURS)).strftime("%Y-%m-%d %H:%M:%S")
+    rows = [[file_id, st.session_state.session_id, expires_at] for file_id in file_ids]
+    try:
+        _, sheets_client = get_google_services()
+        sheet = get_or_create_sheet(sheets_client, "PendingMedia")
+        verify_headers(sheets_client, ("PendingMedia",))
+        append_rows(sheet, rows)
+        return True
+    except Exception as e:
+        st.error(f"Could not record uploads, please upload them again: {str(e)}")
+        return False
+
+def discard_upload(drive_service, file_id):
+    """Delete a new upload that nothing will reference, logging if it stays behind"""
+    try:
+        delete_drive_file(drive_service, file_id, http=get_thread_http(get_credentials()))
+    except Exception as e:
+        logger.warning("Could not delete unrecorded upload %s: %s", file_id, e)
+
+def upload_new_media(drive_service, files, name_prefix, folder_id):
+    """Upload files concurrently, reusing results for bytes already uploaded"""
+    if "uploaded_hashes" not in st.session_state:
+        st.session_state.uploaded_hashes = {}
+    uploaded_hashes = st.session_state.uploaded_hashes
+    
+    if "upload_digests" not in st.session_state:
+        st.session_state.upload_digests = {}
+    upload_digests = st.session_state.upload_digests
+    
+    # Hash each uploaded file once rather than on every rerun
+    digests = []
+    for file in files:
+        if file.file_id not in upload_digests:
+            upload_digests[file.file_id] = hashlib.sha256(file.getbuffer()).hexdigest()
+        digests.append(upload_digests[file.file_id])
+    # Uploads are reused only under the same name, so a file is never linked
+    # under another teacher's or visit's name; the same file selected twice
+    # is uploaded once and shared by both entries
+    keys = [(digest, f"{name_prefix}_{file.name}") for digest, file in zip(digests, files)]
+    pending = {}
+    for key, file in zip(keys, files):
+        if key not in uploaded_hashes:
+            pending.setdefault(key, file)
+    pending = list(pending.items())
+    
+    if pending:
+        with st.spinner(f"Uploading {len(pending)} file(s)..."):
+            results = upload_many_to_drive(
+                drive_service,
+                [
+                    (
+                        file,
+                        name,
+                        file.type or guess_mimetype(file.name),
+                        digest
+                    )
+                    for (digest, name), file in pending
+                ],
+                folder_id
+            )
+        uploaded = [(key, file, result) for (key, file), result in zip(pending, results) if result]
+        
+        # cleanup_media.py only spares files with a PendingMedia or Media row,
+        # so an upload that could not be recorded counts as failed
+        if uploaded and not record_pending_media([result['id'] for _, _, result in uploaded]):
+            for _, _, result in uploaded:
+                if not result.get('existing'):
+                    discard_upload(drive_service, result['id'])
+            uploaded = []
+        
+        for key, file, result in uploaded:
+            uploaded_hashes[key] = result
+            st.success(f"Uploaded {file.name}")
+    
+    return [uploaded_hashes.get(key) for key in keys]
+
 def handle_media_upload(drive_service, teacher_name, school_name, visit_date, folder_id):
     """Handle media file uploads"""
     if not folder_id:
@@ -15,7 +101,8 @@ def handle_media_upload(drive_service, teacher_name, school_name, visit_date, fo
         return []
     
     uploaded_files = []
-    unique_key = f"{teacher_name}_{school_name}_{visit_date}_{datetime.now().timestamp()}"
+    # Keep widget keys stable across reruns so uploaded files persist
+    unique_key = f"{teacher_name}_{school_name}_{visit_date}"
     
     col1, col2 = st.columns(2)
     
@@ -26,25 +113,6 @@ def handle_media_upload(drive_service, teacher_name, school_name, visit_date, fo
             accept_multiple_files=True,
             key=f"photos_{unique_key}"
         )
-        
-        if photos:
-            for photo in photos:
-                with st.spinner(f"Uploading {photo.name}..."):
-                    result = upload_to_drive(
-                        drive_service,
-                        photo.getvalue(),
-                        f"{school_name}_{teacher_name}_{visit_date}_{photo.name}",
-                        photo.type,
-                        folder_id
-                    )
-                    if result:
-                        uploaded_files.append({
-                            'type': 'photo',
-                            'name': photo.name,
-                            'drive_file_id': result['id'],
-                            'link': result['link']
-                        })
-                        st.success(f"Uploaded {photo.name}")
     
     with col2:
         videos = st.file_uploader(
@@ -53,79 +121,126 @@ def handle_media_upload(drive_service, teacher_name, school_name, visit_date, fo
             accept_multiple_files=True,
             key=f"videos_{unique_key}"
         )
-        
-        if videos:
-            for video in videos:
-                with st.spinner(f"Uploading {video.name}..."):
-                    result = upload_to_drive(
-                        drive_service,
-                        video.getvalue(),
-                        f"{school_name}_{teacher_name}_{visit_date}_{video.name}",
-                        video.type,
-                        folder_id
-                    )
-                    if result:
-                        uploaded_files.append({
-                            'type': 'video',
-                            'name': video.name,
-                            'drive_file_id': result['id'],
-                            'link': result['link']
-                        })
-                        st.success(f"Uploaded {video.name}")
+    
+    # Photos and videos go up together so their uploads overlap
+    media = [('photo', photo) for photo in photos or []] + [('video', video) for video in videos or []]
+    if not media:
+        return uploaded_files
+    
+    results = upload_new_media(
+        drive_service,
+        [file for _, file in media],
+        f"{school_name}_{teacher_name}_{visit_date}",
+        folder_id
+    )
+    for (media_type, file), result in zip(media, results):
+        if result:
+            uploaded_files.append({
+                'type': media_type,
+                'teacher': teacher_name,
+                'name': file.name,
+                'drive_file_id': result['id'],
+                'link': result['link']
+            })
     
     return uploaded_files
 
 def add_new_teacher(sheets_client, school_name, teacher_name, is_trained):
     """Add a new teacher to the database"""
-    sheet = get_or_create_sheet(sheets_client, "Teachers")
-    if not sheet:
-        return False
-    
     try:
-        teachers_data = sheet.get_all_records()
-        for teacher in teachers_data:
-            if (teacher["School Name"] == school_name and 
-                teacher["Teacher Name"].lower() == teacher_name.lower()):
-                st.error("Teacher already exists in this school")
-                return False
+        # Check the cached index before touching the sheet so duplicates cost no API calls
+        _, seen = teacher_index(sheets_client)
+        if teacher_key(school_name, teacher_name) in seen:
+            st.error("Teacher already exists in this school")
+            return False
         
+        sheet = get_or_create_sheet(sheets_client, "Teachers")
+        # Rows are written by position, so a reordered column would corrupt them
+        verify_headers(sheets_client, ("Teachers",))
         row = [
             school_name,
             teacher_name,
             is_trained,
             datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         ]
-        sheet.append_row(row)
+        append_rows(sheet, [row])
+        load_reference_records.clear()
+        teacher_index.clear()
         return True
     except Exception as e:
         st.error(f"Error adding teacher: {str(e)}")
         return False
 
-def save_observation(sheets_client, data):
-    """Save observation data to Google Sheets"""
-    sheet = get_or_create_sheet(sheets_client, "Observations")
-    if not sheet:
-        return False
-    
+def observation_rows(data):
+    """Build the rows one submitted form adds to each sheet, keyed by sheet name"""
+    details = data["basic_details"]
+    visit_id = uuid.uuid4().hex
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    trained = set(data["teacher_details"]["trained_teachers"])
+    
+    rows = {"Observations": [], "Media": [], "Infrastructure": [], "Community": []}
+    for teacher, metrics in data.get("observations", {}).items():
+        rows["Observations"].append([
+            visit_id,
+            timestamp,
+            details["pm_name"],
+            details["school_name"],
+            details["visit_date"],
+            details["visit_type"],
+            teacher,
+            teacher in trained,
+            *(metrics["teacher_metrics"].get(key, "") for key in TEACHER_METRICS),
+            *(metrics["student_metrics"].get(key, "") for key in STUDENT_METRICS)
+        ])
+    
+    for media in data.get("media_files", []):
+        rows["Media"].append([
+            visit_id,
+            media.get("teacher", ""),
+            media["type"],
+            media["name"],
+            media["drive_file_id"],
+            media["link"]
+        ])
+    
+    if details["visit_type"] == "Monthly":
+        for subject, metrics in data.get("infrastructure", {}).items():
+            rows["Infrastructure"].append([
+                visit_id,
+                subject,
+                *(metrics.get(key, "") for key in INFRASTRUCTURE_METRICS)
+            ])
+        community = data.get("community")
+        if community:
+            rows["Community"].append([
+                visit_id,
+                *(community.get(key, "") for key in COMMUNITY_FIELDS)
+            ])
+    
+    return rows
+
+def save_observations(sheets_client, observations):
+    """Save several observations to Google Sheets in one batched write"""
     try:
-        row = [
-            datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            data["basic_details"]["pm_name"],
-            data["basic_details"]["school_name"],
-            data["basic_details"]["visit_date"],
-            data["basic_details"]["visit_type"],
-            json.dumps(data["teacher_details"]),
-            json.dumps(data.get("observations", {})),
-            json.dumps(data.get("infrastructure", {})) if data["basic_details"]["visit_type"] == "Monthly" else "{}",
-            json.dumps(data.get("community", {})) if data["basic_details"]["visit_type"] == "Monthly" else "{}",
-            json.dumps(data.get("media_files", []))
-        ]
-        sheet.append_row(row)
+        rows = {}
+        for data in observations:
+            for sheet_name, sheet_rows in observation_rows(data).items():
+                rows.setdefault(sheet_name, []).extend(sheet_rows)
+        
+        with st.spinner("Saving..."):
+            append_to_sheets(sheets_client, rows)
         return True
     except Exception as e:
         st.error(f"Error saving observation: {str(e)}")
         return False
 
+def save_observation(sheets_client, data):
+    """Save observation data to Google Sheets"""
+    return save_observations(sheets_client, [data])
+
+# Widget changes inside these sections rerun only the section itself;
+# page changes call st.rerun() to redraw the whole app
+@st.fragment
 def basic_details_section(sheets_client):
     st.subheader("Basic Details")
     
@@ -157,9 +272,11 @@ def basic_details_section(sheets_client):
                 "visit_type": visit_type
             }
             st.session_state.page = 2
+            st.rerun()
         else:
             st.error("Please fill in all fields")
 
+@st.fragment
 def teacher_selection_section(sheets_client):
     st.subheader("Teacher Selection")
     
@@ -190,7 +307,7 @@ def teacher_selection_section(sheets_client):
                     training_status == "Trained"
                 ):
                     st.success(f"Added teacher {new_teacher_name}")
-                    st.rerun()
+                    st.rerun(scope="fragment")
             else:
                 st.error("Please enter teacher name")
 
@@ -210,6 +327,7 @@ def teacher_selection_section(sheets_client):
     with col1:
         if st.button("← Previous"):
             st.session_state.page = 1
+            st.rerun()
     with col2:
         if st.button("Next →", type="primary"):
             if trained_teachers or untrained_teachers:
@@ -218,6 +336,7 @@ def teacher_selection_section(sheets_client):
                     "untrained_teachers": untrained_teachers
                 }
                 st.session_state.page = 3
+                st.rerun()
             else:
                 st.error("Please select at least one teacher")
 
@@ -250,51 +369,15 @@ def classroom_observation_section(drive_service, folder_id):
             with col1:
                 st.write("Teacher Actions")
                 teacher_metrics = {
-                    "lesson_plan": st.selectbox(
-                        "Has the teacher shared the lesson plan?",
-                        options=["Yes", "No", "Sometimes"],
-                        key=f"{teacher}_lesson_plan"
-                    ),
-                    "movement": st.selectbox(
-                        "Is the teacher moving around?",
-                        options=["Yes", "No", "Sometimes"],
-                        key=f"{teacher}_movement"
-                    ),
-                    "activities": st.selectbox(
-                        "Is the teacher using hands-on activities?",
-                        options=["Yes", "No", "Sometimes"],
-                        key=f"{teacher}_activities"
-                    ),
-                    "encouragement": st.selectbox(
-                        "Is the teacher encouraging participation?",
-                        options=["Yes", "No", "Sometimes"],
-                        key=f"{teacher}_encouragement"
-                    )
+                    metric: st.selectbox(question, options=YNS, key=f"{teacher}_{metric}")
+                    for metric, question in TEACHER_QUESTIONS.items()
                 }
             
             with col2:
                 st.write("Student Actions")
                 student_metrics = {
-                    "questions": st.selectbox(
-                        "Are students asking questions?",
-                        options=["Yes", "No", "Sometimes"],
-                        key=f"{teacher}_questions"
-                    ),
-                    "explanation": st.selectbox(
-                        "Are students explaining their work?",
-                        options=["Yes", "No", "Sometimes"],
-                        key=f"{teacher}_explanation"
-                    ),
-                    "involvement": st.selectbox(
-                        "Are students involved in activities?",
-                        options=["Yes", "No", "Sometimes"],
-                        key=f"{teacher}_involvement"
-                    ),
-                    "peer_learning": st.selectbox(
-                        "Are students helping each other learn?",
-                        options=["Yes", "No", "Sometimes"],
-                        key=f"{teacher}_peer_learning"
-                    )
+                    metric: st.selectbox(question, options=YNS, key=f"{teacher}_{metric}")
+                    for metric, question in STUDENT_QUESTIONS.items()
                 }
             
             st.write("---")
@@ -35,8 +35,8 @@ def get_google_services():
                    'https://www.googleapis.com/auth/spreadsheets']
         )
         
-        drive_service = build('drive', 'v3', credentials=credentials)
-        sheets_service = build('sheets', 'v4', credentials=credentials)
+        drive_service = build('drive', 'v3', credentials=credentials, cache_discovery=False, static_discovery=True)
+        sheets_service = build('sheets', 'v4', credentials=credentials, cache_discovery=False, static_discovery=True)
         
         return drive_service, sheets_service
     except Exception as e:
@@ -44,6 +44,15 @@ def get_google_services():
         return None, None
         
 class VisitFormApp:
+    # Page number -> name of the section method that renders it
+    PAGES = {
+        1: "section_1_basic_details",
+        2: "section_2_teacher_selection",
+        3: "section_3_classroom_observation",
+        4: "section_4_infrastructure",
+        5: "section_5_community"
+    }
+    
     def __init__(self):
         services = get_google_services()
         if not services or None in services:
@@ -65,26 +74,24 @@ class VisitFormApp:
             return
             
         try:
-            # Load Schools data
-            result = self.sheets_service.spreadsheets().values().get(
+            # Load Schools and Teachers data in one request
+            result = self.sheets_service.spreadsheets().values().batchGet(
                 spreadsheetId=self.SHEET_ID,
-                range='Schools!A:B'  # Assuming column A is PM, column B is School
+                ranges=[
+                    'Schools!A:B',  # Assuming column A is PM, column B is School
+                    'Teachers!A:C'  # Assuming columns: School, Teacher Name, Training Status
+                ]
             ).execute()
+            schools_range, teachers_range = result.get('valueRanges', [{}, {}])
             
-            schools_values = result.get('values', [])
+            schools_values = schools_range.get('values', [])
             if not schools_values:
                 raise ValueError("No data found in Schools sheet")
                 
             schools_df = pd.DataFrame(schools_values[1:], columns=schools_values[0])
             self.pm_school_mapping = schools_df.groupby('Program Manager')['School'].apply(list).to_dict()
             
-            # Load Teachers data
-            result = self.sheets_service.spreadsheets().values().get(
-                spreadsheetId=self.SHEET_ID,
-                range='Teachers!A:C'  # Assuming columns: School, Teacher Name, Training Status
-            ).execute()
-            
-            teachers_values = result.get('values', [])
+            teachers_values = teachers_range.get('values', [])
             if not teachers_values:
                 raise ValueError("No data found in Teachers sheet")
                 
@@ -462,16 +469,9 @@ class VisitFormApp:
         """Main app entry point"""
         st.title("Program Manager Visit Form")
         
-        if st.session_state.page == 1:
-            self.section_1_basic_details()
-        elif st.session_state.page == 2:
-            self.section_2_teacher_selection()
-        elif st.session_state.page == 3:
-            self.section_3_classroom_observation()
-        elif st.session_state.page == 4:
-            self.section_4_infrastructure()
-        elif st.session_state.page == 5:
-            self.section_5_community()
+        section = self.PAGES.get(st.session_state.page)
+        if section:
+            getattr(self, section)()
 
 if __name__ == "__main__":
     app = VisitFormApp()
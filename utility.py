@@ -3,10 +3,25 @@ import streamlit as st
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
 from googleapiclient.http import MediaIoBaseUpload
+from googleapiclient.errors import HttpError
+from google_auth_httplib2 import AuthorizedHttp
+from google.auth.transport.requests import AuthorizedSession
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from requests import exceptions as requests_errors
+import httplib2
+import socket
 import gspread
-import json
+from tenacity import retry, stop_after_attempt, wait_exponential_jitter, retry_if_exception, before_sleep_log
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import io
 import mimetypes
+import functools
+import os
+
+logger = logging.getLogger(__name__)
 
 # Google API setup
 SCOPES = [
@@ -15,176 +30,620 @@ SCOPES = [
     'https://www.googleapis.com/auth/drive'
 ]
 
+# Classroom observation questions, keyed by the metric each answer is stored under
+TEACHER_QUESTIONS = {
+    "lesson_plan": "Has the teacher shared the lesson plan?",
+    "movement": "Is the teacher moving around?",
+    "activities": "Is the teacher using hands-on activities?",
+    "encouragement": "Is the teacher encouraging participation?"
+}
+STUDENT_QUESTIONS = {
+    "questions": "Are students asking questions?",
+    "explanation": "Are students explaining their work?",
+    "involvement": "Are students involved in activities?",
+    "peer_learning": "Are students helping each other learn?"
+}
+
+# Flat metric columns of the Observations, Infrastructure and Community sheets
+TEACHER_METRICS = tuple(TEACHER_QUESTIONS)
+STUDENT_METRICS = tuple(STUDENT_QUESTIONS)
+INFRASTRUCTURE_METRICS = ("materials", "storage", "condition")
+COMMUNITY_FIELDS = ("parent_meetings", "parent_attendance", "community_events", "smc_meetings", "notes")
+
+# Header row written when a worksheet is first created
+HEADERS = {
+    "Observations": (
+        "Visit ID", "Timestamp", "PM Name", "School Name", "Visit Date",
+        "Visit Type", "Teacher Name", "Is Trained",
+        *TEACHER_METRICS, *STUDENT_METRICS
+    ),
+    "Media": ("Visit ID", "Teacher Name", "Type", "Name", "File ID", "Link"),
+    "Infrastructure": ("Visit ID", "Subject", *INFRASTRUCTURE_METRICS),
+    "Community": ("Visit ID", *COMMUNITY_FIELDS),
+    "PendingMedia": ("File ID", "Session ID", "Expires At"),
+    "Schools": ("School Name", "Program Manager", "Added Date"),
+    "Teachers": ("School Name", "Teacher Name", "Is Trained", "Added Date")
+}
+
+# Drive appProperty set on a new workbook until its sheets and sharing are in place
+SETUP_PENDING_PROPERTY = "setup_pending"
+
+# Text cells read as True in boolean columns such as Is Trained
+TRUE_STRINGS = frozenset(("true", "1", "yes", "y"))
+
+# Seconds that reference data read from Sheets is reused before re-fetching
+CACHE_TTL = 300
+
+# Sheets read together at the start of a session
+REFERENCE_SHEETS = ("Schools", "Teachers")
+
+# Uploads not referenced from the Media sheet by then are deleted by cleanup_media.py
+PENDING_MEDIA_HOURS = 24
+
+# Network failures where no usable response came back, on either HTTP stack
+NETWORK_ERRORS = (
+    requests_errors.ConnectionError,
+    requests_errors.Timeout,
+    httplib2.HttpLib2Error,
+    ConnectionError,
+    TimeoutError,
+    socket.timeout
+)
+
+# Files smaller than this go up in one request instead of a resumable session
+RESUMABLE_THRESHOLD = 5 * 1024 * 1024
+UPLOAD_CHUNKSIZE = 8 * 1024 * 1024
+
+@st.cache_resource
+def get_credentials():
+    """Build service account credentials from Streamlit secrets"""
+    service_account_info = st.secrets["gcp_service_account"]
+    
+    # Manually construct the credentials dict
+    credentials_dict = {
+        "type": service_account_info["type"],
+        "project_id": service_account_info["project_id"],
+        "private_key_id": service_account_info["private_key_id"],
+        "private_key": service_account_info["private_key"],
+        "client_email": service_account_info["client_email"],
+        "client_id": service_account_info.get("client_id", ""),
+        "auth_uri": "https://accounts.google.com/o/oauth2/auth",
+        "token_uri": "https://oauth2.googleapis.com/token",
+        "auth_provider_x509_cert_url": "https://www.googleapis.com/oauth2/v1/certs",
+        "client_x509_cert_url": service_account_info.get("client_x509_cert_url", "")
+    }
+    
+    return service_account.Credentials.from_service_account_info(
+        credentials_dict,
+        scopes=SCOPES
+    )
+
+def error_status(error):
+    """HTTP status of a Sheets or Drive API error, or None for other errors"""
+    if isinstance(error, gspread.exceptions.APIError):
+        return error.response.status_code
+    if isinstance(error, HttpError):
+        return error.resp.status
+    return None
+
+def is_transient_error(error):
+    """Whether a Google API error is a rate limit, server or network error worth retrying"""
+    if isinstance(error, NETWORK_ERRORS):
+        return True
+    status = error_status(error)
+    return status is not None and (status == 429 or status >= 500)
+
+def is_rate_limited(error):
+    """Whether a Google API request was refused for quota before being applied"""
+    return error_status(error) == 429
+
+# Retries transient Sheets/Drive failures with jittered exponential backoff
+google_retry = retry(
+    stop=stop_after_attempt(5),
+    wait=wait_exponential_jitter(initial=0.5, max=8),
+    retry=retry_if_exception(is_transient_error),
+    before_sleep=before_sleep_log(logger, logging.DEBUG),
+    reraise=True
+)
+
+# Retries writes that must not be applied twice, such as row appends
+write_retry = retry(
+    stop=stop_after_attempt(5),
+    wait=wait_exponential_jitter(initial=0.5, max=8),
+    retry=retry_if_exception(is_rate_limited),
+    before_sleep=before_sleep_log(logger, logging.DEBUG),
+    reraise=True
+)
+
+# Worker pool for blocking Drive uploads, shared by every session
+UPLOAD_WORKERS = 8
+EXECUTOR = ThreadPoolExecutor(max_workers=UPLOAD_WORKERS)
+
+# Drive connections owned by each upload worker thread
+thread_local = threading.local()
+
+def get_thread_http(credentials):
+    """Authorized Http for the current thread, kept for later uploads on it"""
+    if not hasattr(thread_local, "http"):
+        thread_local.http = AuthorizedHttp(credentials, http=httplib2.Http())
+    return thread_local.http
+
+def get_pooled_session(credentials):
+    """Authorized requests session that keeps HTTPS connections alive between calls"""
+    session = AuthorizedSession(credentials)
+    # Only retry connects that never reached Google here. A read timeout may
+    # follow an applied append, so read errors are left to google_retry,
+    # which repeats only the idempotent calls it wraps
+    adapter = HTTPAdapter(
+        pool_connections=16,
+        pool_maxsize=32,
+        max_retries=Retry(total=3, connect=3, read=0, status=0, backoff_factor=0.3)
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers["Connection"] = "keep-alive"
+    return session
+
 @st.cache_resource
 def get_google_services():
     """Get Google Drive and Sheets services using service account."""
     try:
-        # Debug: Print secrets structure
         if "gcp_service_account" not in st.secrets:
             st.error("No 'gcp_service_account' secret found")
             return None, None
         
         # Try to parse the service account info
         service_account_info = st.secrets["gcp_service_account"]
-        st.write("Service Account Info Type:", type(service_account_info))
-        st.write("Available keys:", service_account_info.keys())
+        logger.debug("Service account keys: %s", list(service_account_info.keys()))
         
         # Check specific required fields
         required_fields = ["type", "project_id", "private_key_id", "private_key", "client_email"]
         for field in required_fields:
             if field not in service_account_info:
                 st.error(f"Missing required field: {field}")
-            else:
-                # Safely print the first few characters of each field
-                value = service_account_info[field]
-                safe_value = str(value)[:10] + "..." if len(str(value)) > 10 else str(value)
-                st.write(f"{field}: {safe_value}")
-        
-        # Manually construct the credentials dict
-        credentials_dict = {
-            "type": service_account_info["type"],
-            "project_id": service_account_info["project_id"],
-            "private_key_id": service_account_info["private_key_id"],
-            "private_key": service_account_info["private_key"],
-            "client_email": service_account_info["client_email"],
-            "client_id": service_account_info.get("client_id", ""),
-            "auth_uri": "https://accounts.google.com/o/oauth2/auth",
-            "token_uri": "https://oauth2.googleapis.com/token",
-            "auth_provider_x509_cert_url": "https://www.googleapis.com/oauth2/v1/certs",
-            "client_x509_cert_url": service_account_info.get("client_x509_cert_url", "")
-        }
         
         # Try to create credentials
-        credentials = service_account.Credentials.from_service_account_info(
-            credentials_dict,
-            scopes=SCOPES
-        )
+        credentials = get_credentials()
         
         # Create services
-        drive_service = build('drive', 'v3', credentials=credentials)
-        sheets_client = gspread.authorize(credentials)
+        drive_service = build(
+            'drive', 'v3',
+            http=AuthorizedHttp(credentials, http=httplib2.Http()),
+            cache_discovery=False,
+            static_discovery=True
+        )
+        sheets_client = gspread.Client(credentials, session=get_pooled_session(credentials))
         
-        st.success("Successfully created Google services!")
+        logger.info("Successfully created Google services")
         return drive_service, sheets_client
         
     except Exception as e:
-        st.error("Failed to initialize Google services")
-        st.error(f"Error Type: {type(e)}")
-        st.error(f"Error Message: {str(e)}")
-        
-        # If it's a credentials error, print more details
-        if hasattr(e, 'args') and e.args:
-            st.error("Detailed error information:")
-            for arg in e.args:
-                st.error(str(arg))
-        
+        logger.exception("Failed to initialize Google services")
+        st.error(f"Failed to initialize Google services: {type(e).__name__}: {str(e)}")
         return None, None
 
-def upload_to_drive(service, file_data, filename, mimetype, folder_id):
-    """Upload file to Google Drive"""
+@functools.lru_cache(maxsize=None)
+def mimetype_for_extension(extension):
+    """Mimetype for a file extension such as '.jpg', memoized per extension"""
+    return mimetypes.guess_type(f"file{extension}")[0] or 'application/octet-stream'
+
+def guess_mimetype(filename):
+    """Mimetype for a filename, falling back to application/octet-stream"""
+    return mimetype_for_extension(os.path.splitext(filename)[1].lower())
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def verify_folder_access(_service, folder_id):
+    """Fetch the Drive folder, raising if the service account cannot see it"""
+    google_retry(_service.files().get(
+        fileId=folder_id,
+        fields='id',
+        supportsAllDrives=True
+    ).execute)()
+    return True
+
+def check_folder_access(service, folder_id):
+    """Check that the service account can see the Drive folder"""
     try:
-        file_metadata = {
-            'name': filename,
-            'parents': [folder_id]
-        }
-        
-        media = MediaIoBaseUpload(
-            io.BytesIO(file_data),
-            mimetype=mimetype,
-            resumable=True
+        return verify_folder_access(service, folder_id)
+    except Exception as e:
+        logger.debug("Drive folder %s is not accessible: %s", folder_id, e)
+        return False
+
+def drive_query_literal(value):
+    """Quote a value for use inside a Drive files.list query string"""
+    return "'" + str(value).replace("\\", "\\\\").replace("'", "\\'") + "'"
+
+def find_drive_files(service, files, folder_id):
+    """Map each (sha256, filename) pair already uploaded to the folder to its file id and link"""
+    found = {}
+    files = list(dict.fromkeys(files))
+    
+    def collect(request_id, response, exception):
+        # A failed lookup just means the file gets uploaded again
+        if exception is not None:
+            logger.debug("Drive lookup for %s failed: %s", request_id, exception)
+            return
+        matches = response.get('files', [])
+        if matches:
+            found[files[int(request_id)]] = {
+                'id': matches[0].get('id'),
+                'link': matches[0].get('webViewLink'),
+                'existing': True
+            }
+    
+    for start in range(0, len(files), 100):
+        batch = service.new_batch_http_request(callback=collect)
+        for i in range(start, min(start + 100, len(files))):
+            sha256, filename = files[i]
+            # Matching the name too keeps a file uploaded for another school,
+            # teacher or visit from being linked under the wrong name
+            batch.add(service.files().list(
+                q=(
+                    f"appProperties has {{ key='sha256' and value={drive_query_literal(sha256)} }} "
+                    f"and name = {drive_query_literal(filename)} "
+                    f"and {drive_query_literal(folder_id)} in parents and trashed = false"
+                ),
+                fields='files(id, webViewLink)',
+                pageSize=1,
+                supportsAllDrives=True,
+                includeItemsFromAllDrives=True
+            ), request_id=str(i))
+        google_retry(batch.execute)()
+    return found
+
+def create_drive_file(service, stream, filename, mimetype, folder_id, http=None, sha256=None):
+    """Upload a file-like object to Google Drive, raising on failure"""
+    file_metadata = {
+        'name': filename,
+        'parents': [folder_id]
+    }
+    if sha256:
+        file_metadata['appProperties'] = {'sha256': sha256}
+    
+    size = stream.seek(0, io.SEEK_END)
+    stream.seek(0)
+    
+    resumable = size >= RESUMABLE_THRESHOLD
+    media = MediaIoBaseUpload(
+        stream,
+        mimetype=mimetype,
+        chunksize=UPLOAD_CHUNKSIZE,
+        resumable=resumable
+    )
+    
+    request = service.files().create(
+        body=file_metadata,
+        media_body=media,
+        fields='id, webViewLink',
+        supportsAllDrives=True
+    )
+    
+    if not resumable:
+        # Resending an applied multipart create would leave a second file
+        file = write_retry(request.execute)(http=http)
+    else:
+        # Send the file chunk by chunk so a dropped connection only
+        # resends the current chunk instead of the whole file
+        next_chunk = google_retry(request.next_chunk)
+        file = None
+        while file is None:
+            status, file = next_chunk(http=http)
+    
+    return {
+        'id': file.get('id'),
+        'link': file.get('webViewLink')
+    }
+
+def delete_drive_file(service, file_id, http=None):
+    """Delete a Drive file, raising on failure"""
+    request = service.files().delete(fileId=file_id, supportsAllDrives=True)
+    google_retry(request.execute)(http=http)
+
+def upload_many_to_drive(service, files, folder_id):
+    """Upload (stream, filename, mimetype, sha256) tuples to Google Drive concurrently"""
+    credentials = get_credentials()
+    try:
+        existing = find_drive_files(
+            service, [(sha256, filename) for _, filename, _, sha256 in files if sha256], folder_id
         )
-        
-        file = service.files().create(
-            body=file_metadata,
-            media_body=media,
-            fields='id, webViewLink',
-            supportsAllDrives=True
-        ).execute()
-        
-        return {
-            'id': file.get('id'),
-            'link': file.get('webViewLink')
-        }
     except Exception as e:
-        st.error(f"Error uploading {filename}: {str(e)}")
-        return None
+        logger.debug("Drive dedupe lookup failed: %s", e)
+        existing = {}
+    
+    def upload(stream, filename, mimetype, sha256):
+        http = get_thread_http(credentials)
+        return create_drive_file(service, stream, filename, mimetype, folder_id, http=http, sha256=sha256)
+    
+    results = [None] * len(files)
+    futures = {}
+    for i, file in enumerate(files):
+        key = (file[3], file[1])
+        if key in existing:
+            results[i] = existing[key]
+        else:
+            futures[EXECUTOR.submit(upload, *file)] = i
+    progress = st.progress(0.0)
+    for done, future in enumerate(as_completed(futures), 1):
+        i = futures[future]
+        try:
+            results[i] = future.result()
+        except Exception as e:
+            st.error(f"Error uploading {files[i][1]}: {str(e)}")
+        progress.progress(done / len(futures))
+    progress.empty()
+    return results
+
+@write_retry
+def append_rows(sheet, rows):
+    """Append rows to the end of a worksheet in one request"""
+    sheet.append_rows(rows, value_input_option='RAW', insert_data_option='INSERT_ROWS')
+
+def cell_data(value):
+    """Wrap a Python value as Sheets CellData, stored as-is like RAW input"""
+    if isinstance(value, bool):
+        return {"userEnteredValue": {"boolValue": value}}
+    if isinstance(value, (int, float)):
+        return {"userEnteredValue": {"numberValue": value}}
+    return {"userEnteredValue": {"stringValue": str(value)}}
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def verify_headers(_client, sheet_names):
+    """Raise if a sheet's header row does not start with the columns in HEADERS"""
+    workbook = get_workbook(_client)
+    response = google_retry(workbook.values_batch_get)([f"{name}!1:1" for name in sheet_names])
+    for sheet_name, value_range in zip(sheet_names, response["valueRanges"]):
+        expected = HEADERS[sheet_name]
+        header = tuple((value_range.get("values") or [[]])[0][:len(expected)])
+        if header != expected:
+            raise ValueError(
+                f"The {sheet_name} sheet's header row does not match the columns this app writes. "
+                f"Rename the existing {sheet_name} sheet so a new one is created."
+            )
+    return True
+
+def append_to_sheets(client, rows_by_sheet):
+    """Append rows to several worksheets with a single batchUpdate request"""
+    workbook = get_workbook(client)
+    sheet_ids = {sheet.title: sheet.id for sheet in google_retry(workbook.worksheets)()}
+    
+    requests = []
+    for sheet_name, rows in rows_by_sheet.items():
+        if not rows:
+            continue
+        if sheet_name not in sheet_ids:
+            sheet_ids[sheet_name] = get_or_create_sheet(client, sheet_name).id
+        requests.append({
+            "appendCells": {
+                "sheetId": sheet_ids[sheet_name],
+                "rows": [{"values": [cell_data(value) for value in row]} for row in rows],
+                "fields": "userEnteredValue"
+            }
+        })
+    
+    # Rows appended under an older header would land in the wrong columns
+    checked = tuple(name for name, rows in rows_by_sheet.items() if rows and name in HEADERS)
+    if checked:
+        verify_headers(client, checked)
+    
+    if requests:
+        write_retry(workbook.batch_update)({"requests": requests})
+
+def share_workbook(service, file_id, emails):
+    """Give link holders and each email writer access in one Drive batch request"""
+    permissions = [{'type': 'anyone', 'role': 'writer'}] + [
+        {'type': 'user', 'role': 'writer', 'emailAddress': email}
+        for email in emails
+    ]
+    
+    errors = []
+    def collect_error(request_id, response, exception):
+        if exception:
+            errors.append(exception)
+    
+    batch = service.new_batch_http_request(callback=collect_error)
+    for permission in permissions:
+        batch.add(service.permissions().create(
+            fileId=file_id,
+            body=permission,
+            sendNotificationEmail=False,
+            supportsAllDrives=True
+        ))
+    google_retry(batch.execute)()
+    
+    # Failures inside a batch are reported per request rather than raised
+    if errors:
+        raise errors[0]
+
+@st.cache_resource
+def get_workbook(_client):
+    """Open the School_Observations workbook once, creating it if missing"""
+    drive_service, _ = get_google_services()
+    try:
+        workbook = google_retry(_client.open)("School_Observations")
+    except gspread.exceptions.SpreadsheetNotFound:
+        # The file and its pending marker are created in one request, so an
+        # interrupted setup is finished by whichever open comes next
+        file = write_retry(drive_service.files().create(
+            body={
+                'name': "School_Observations",
+                'mimeType': 'application/vnd.google-apps.spreadsheet',
+                'appProperties': {SETUP_PENDING_PROPERTY: 'true'}
+            },
+            fields='id',
+            supportsAllDrives=True
+        ).execute)()
+        workbook = google_retry(_client.open_by_key)(file['id'])
+    
+    if is_setup_pending(drive_service, workbook.id):
+        finish_workbook_setup(drive_service, workbook)
+    return workbook
+
+def is_setup_pending(service, file_id):
+    """Whether a workbook was created but its sheets or sharing were never finished"""
+    file = google_retry(service.files().get(
+        fileId=file_id,
+        fields='appProperties',
+        supportsAllDrives=True
+    ).execute)()
+    return file.get('appProperties', {}).get(SETUP_PENDING_PROPERTY) == 'true'
+
+def finish_workbook_setup(service, workbook):
+    """Add the sheets and sharing of a new workbook, then clear its pending marker"""
+    bootstrap_workbook(workbook)
+    share_workbook(service, workbook.id, st.secrets.get("share_with", []))
+    google_retry(service.files().update(
+        fileId=workbook.id,
+        body={'appProperties': {SETUP_PENDING_PROPERTY: None}},
+        supportsAllDrives=True
+    ).execute)()
+
+def bootstrap_workbook(workbook):
+    """Add any missing HEADERS sheets to a new workbook and write their header rows"""
+    sheet_ids = {sheet.title: sheet.id for sheet in google_retry(workbook.worksheets)()}
+    requests = [
+        {"addSheet": {"properties": {
+            "title": name,
+            "gridProperties": {"rowCount": 1000, "columnCount": 20}
+        }}}
+        for name in HEADERS
+        if name not in sheet_ids
+    ] + [
+        # A new spreadsheet starts with an empty Sheet1 that nothing uses
+        {"deleteSheet": {"sheetId": sheet_id}}
+        for title, sheet_id in sheet_ids.items()
+        if title not in HEADERS
+    ]
+    if requests:
+        google_retry(workbook.batch_update)({"requests": requests})
+    google_retry(workbook.values_batch_update)({
+        "valueInputOption": "RAW",
+        "data": [
+            {"range": f"{name}!A1", "values": [list(headers)]}
+            for name, headers in HEADERS.items()
+        ]
+    })
 
 def get_or_create_sheet(client, sheet_name):
     """Get or create a specific worksheet"""
+    workbook = get_workbook(client)
     try:
-        sheet = client.open("School_Observations").worksheet(sheet_name)
-        return sheet
-    except Exception:
-        try:
-            workbook = client.open("School_Observations")
-        except Exception:
-            workbook = client.create("School_Observations")
-            workbook.share(None, perm_type='anyone', role='writer')
+        return google_retry(workbook.worksheet)(sheet_name)
+    except gspread.exceptions.WorksheetNotFound:
+        sheet = write_retry(workbook.add_worksheet)(sheet_name, 1000, 20)
         
-        sheet = workbook.add_worksheet(sheet_name, 1000, 20)
-        
-        headers = {
-            "Observations": [
-                "Timestamp", "PM Name", "School Name", "Visit Date", 
-                "Visit Type", "Teacher Details", "Observations", 
-                "Infrastructure Data", "Community Data", "Media Links"
-            ],
-            "Schools": ["School Name", "Program Manager", "Added Date"],
-            "Teachers": ["School Name", "Teacher Name", "Is Trained", "Added Date"]
-        }
-        
-        if sheet_name in headers:
-            sheet.insert_row(headers[sheet_name], 1)
+        if sheet_name in HEADERS:
+            google_retry(sheet.update)(range_name='A1', values=[list(HEADERS[sheet_name])], value_input_option='RAW')
         
         return sheet
 
+def split_columns(rows, *names):
+    """Split a header row plus data rows into one list per named column"""
+    if not rows:
+        return tuple([] for _ in names)
+    header = rows[0]
+    indexes = [header.index(name) for name in names]
+    # Sheets omits trailing empty cells, so short rows read as ""
+    return tuple(
+        [row[index] if index < len(row) else "" for row in rows[1:]]
+        for index in indexes
+    )
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def load_reference_records(_sheets_client):
+    """Fetch the raw rows of every reference sheet in one batchGet"""
+    workbook = get_workbook(_sheets_client)
+    # Whole sheets, since hand-edited columns may sit anywhere in the row
+    ranges = list(REFERENCE_SHEETS)
+    params = {"valueRenderOption": "UNFORMATTED_VALUE"}
+    try:
+        response = google_retry(workbook.values_batch_get)(ranges, params=params)
+    except gspread.exceptions.APIError as e:
+        if e.response.status_code != 400:
+            raise
+        # A missing worksheet fails the whole batch, so create it and read again
+        for sheet_name in REFERENCE_SHEETS:
+            get_or_create_sheet(_sheets_client, sheet_name)
+        response = google_retry(workbook.values_batch_get)(ranges, params=params)
+    
+    return {
+        sheet_name: value_range.get("values", [])
+        for sheet_name, value_range in zip(REFERENCE_SHEETS, response["valueRanges"])
+    }
+
+def load_sheet_columns(sheets_client, sheet_name, *names):
+    """Get the named columns of a reference sheet as parallel lists"""
+    rows = load_reference_records(sheets_client)[sheet_name]
+    missing = [name for name in names if rows and name not in rows[0]]
+    if missing:
+        raise ValueError(f"The {sheet_name} sheet's header row has no {', '.join(missing)} column")
+    return split_columns(rows, *names)
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def schools_view(_sheets_client):
+    """Sorted program manager names and their schools, keyed by lowercased name"""
+    pm_names = {}
+    schools_by_pm = {}
+    pm_column, school_column = load_sheet_columns(
+        _sheets_client, "Schools", "Program Manager", "School Name"
+    )
+    for pm_name, school_name in zip(pm_column, school_column):
+        if not pm_name:
+            continue
+        pm_names[pm_name] = None
+        schools_by_pm.setdefault(pm_name.lower(), []).append(school_name)
+    return sorted(pm_names), schools_by_pm
+
 def get_program_managers(sheets_client):
     """Get list of all program managers"""
-    sheet = get_or_create_sheet(sheets_client, "Schools")
-    if not sheet:
-        return []
-    
     try:
-        schools_data = sheet.get_all_records()
-        pm_names = list(set(school["Program Manager"] for school in schools_data))
-        return sorted(pm_names)
+        pm_names, _ = schools_view(sheets_client)
+        return pm_names
     except Exception as e:
         st.error(f"Error fetching program managers: {str(e)}")
         return []
 
 def get_pm_schools(sheets_client, pm_name):
     """Get schools for a specific program manager"""
-    sheet = get_or_create_sheet(sheets_client, "Schools")
-    if not sheet:
-        return []
-    
     try:
-        schools_data = sheet.get_all_records()
-        return [school["School Name"] for school in schools_data 
-                if school["Program Manager"].lower() == pm_name.lower()]
+        _, schools_by_pm = schools_view(sheets_client)
+        return schools_by_pm.get(pm_name.lower(), [])
     except Exception as e:
         st.error(f"Error fetching schools: {str(e)}")
         return []
 
+def teacher_key(school_name, teacher_name):
+    """Key identifying a teacher within a school, ignoring case and outer spaces"""
+    return school_name, str(teacher_name).strip().lower()
+
+def parse_bool(value):
+    """Read a sheet cell as a boolean, treating text like "FALSE" as False"""
+    if isinstance(value, str):
+        return value.strip().lower() in TRUE_STRINGS
+    return bool(value)
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def teacher_index(_sheets_client):
+    """Trained and untrained teachers by school, plus the set of teacher_key pairs"""
+    index = {}
+    seen = set()
+    columns = load_sheet_columns(
+        _sheets_client, "Teachers", "School Name", "Teacher Name", "Is Trained"
+    )
+    for school_name, teacher_name, is_trained in zip(*columns):
+        teachers = index.setdefault(school_name, {"trained": [], "untrained": []})
+        teachers["trained" if parse_bool(is_trained) else "untrained"].append(teacher_name)
+        seen.add(teacher_key(school_name, teacher_name))
+    index = {
+        school_name: {group: tuple(names) for group, names in teachers.items()}
+        for school_name, teachers in index.items()
+    }
+    return index, frozenset(seen)
+
 def get_school_teachers(sheets_client, school_name):
     """Get teachers for a specific school"""
-    sheet = get_or_create_sheet(sheets_client, "Teachers")
-    if not sheet:
-        return {"trained": [], "untrained": []}
-    
     try:
-        teachers_data = sheet.get_all_records()
-        teachers = {
-            "trained": [],
-            "untrained": []
-        }
-        for teacher in teachers_data:
-            if teacher["School Name"] == school_name:
-                if teacher["Is Trained"]:
-                    teachers["trained"].append(teacher["Teacher Name"])
-                else:
-                    teachers["untrained"].append(teacher["Teacher Name"])
-        return teachers
+        index, _ = teacher_index(sheets_client)
+        return index.get(school_name, {"trained": (), "untrained": ()})
     except Exception as e:
         st.error(f"Error fetching teachers: {str(e)}")
-        return {"trained": [], "untrained": []}
+        return {"trained": (), "untrained": ()}